@@ -1,113 +1,72 @@
-# import asyncio
-# import aiohttp
-# from bs4 import BeautifulSoup
-# import pandas as pd
-# import re
-# from urllib.parse import urljoin
-# from urllib.parse import urlparse
-
-# async def fetch_page(session, url):
-#     try:
-#         async with session.get(url) as response:
-#             return await response.text()
-#     except Exception as e:
-#         print(f"Error fetching {url}: {e}")
-#         return None
-
-# async def fetch_year_links(session, year):
-#     year_url = f'https://www.federalreserve.gov/newsevents/speech/{year}speech.htm'
-#     html = await fetch_page(session, year_url)
-#     if html:
-#         soup = BeautifulSoup(html, 'html.parser')
-#         speech_index = soup.find('ul', id='speechIndex')
-#         if speech_index:
-#             base_url = 'https://www.federalreserve.gov'
-#             return [urljoin(base_url, a_tag['href']) for a_tag in speech_index.find_all('a', href=True)]
-#     return []
-
-# async def scrape_speech_data(session, speech_url):
-#     html = await fetch_page(session, speech_url)
-#     if html:
-#         soup = BeautifulSoup(html, 'html.parser')
-#         title_text = soup.find('title').text
-#         # Regex to extract the speaker's name (assumed to be the first word before "--")
-#         speaker_match = re.search(r'Speech,\s(.*?)\s--', title_text)
-#         parsed_url = urlparse(speech_url)
-#         path_segments = parsed_url.path.split('/')
-#         date_segments = path_segments[-1].split('.')[0]
-
-
-#         speaker_name = speaker_match.group(1) if speaker_match else 'Speaker name not found'
-
-#         # Initialize an empty string to store concatenated text
-#         concatenated_text = ''
-
-#         # Find all <table> tags with specified width
-#         tables = soup.find_all('table', width="600")
-
-#         visited_elements = set()  # To track already processed elements
-
-#         for table in tables:
-#             for child in table.descendants:
-#                 if child.name in ['p', 'ul', 'li'] and child not in visited_elements:
-#                     # Mark this element as visited
-#                     visited_elements.add(child)
-#                     if child.name == 'li':
-#                         concatenated_text += '• ' + child.get_text(strip=True) + '\n'
-#                     else:
-#                         concatenated_text += child.get_text(strip=True) + '\n'
-#         return {
-#             'date': date_segments,
-#             'Speaker': speaker_name,
-#             'content': concatenated_text,
-#         }
-#     return {}
-
-# async def fetch_speeches_for_year(session, year):
-#     speech_links = await fetch_year_links(session, year)
-#     tasks = [scrape_speech_data(session, link) for link in speech_links]
-#     return await asyncio.gather(*tasks)
-
-# async def main():
-#     years = range(1996, 2010)  
-#     async with aiohttp.ClientSession() as session:
-#         for year in years:
-#             speeches = await fetch_speeches_for_year(session, year)
-#             # Filter out empty results
-#             speeches = [speech for speech in speeches if speech]
-#             df = pd.DataFrame(speeches)
-#             csv_filename = f'speeches_{year}.csv'
-#             df.to_csv(csv_filename, index=False)
-#             print(f"Data for {year} saved to {csv_filename}")
-
-# if __name__ == "__main__":
-#     asyncio.run(main())
-
-
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import asyncio
+import aiohttp
+from aiohttp_client_cache import CachedSession, SQLiteBackend
+from aiohttp_retry import ExponentialRetry, RetryClient
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.dammit import EncodingDetector
+from selectolax.lexbor import LexborHTMLParser
 import re
-import csv
-from datetime import datetime
+from urllib.parse import urljoin
 from urllib.parse import urlparse
-
-def getYearLinks(yearlink):
+from datetime import timedelta
+from html import unescape
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+SPEECH_SCHEMA = pa.schema([('date', pa.string()), ('speaker', pa.string()), ('content', pa.string())])
+
+HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'),
+    # aiohttp transparently decodes gzip, and br when the brotli package is installed
+    'Accept-Encoding': 'gzip, br',
+}
+# Every request goes to one host: the semaphore and the connector share this cap so no
+# admitted request ever queues for a pooled connection
+MAX_CONNECTIONS_PER_HOST = 16
+_SPEAKER_RE = re.compile(r'Speech,\s(.*?)\s--')
+_TITLE_RE = re.compile(r'<title>(.*?)</title>', re.I | re.S)
+
+async def fetch_page(session, semaphore, url):
+    # The session retries transient errors, only give up once its attempts are exhausted
     try:
-        response = requests.get(yearlink)
-        response.raise_for_status()  # Raises an exception for 4XX/5XX errors
-        soup = BeautifulSoup(response.content, 'html.parser')  # Use content for byte content to handle UTF-8
+        async with semaphore:
+            async with session.get(url, headers=HEADERS) as response:
+                response.raise_for_status()  # Raises an exception for 4XX/5XX errors
+                # Return raw bytes plus the HTTP charset (None if the header has none); lxml reads
+                # <meta> from bytes itself, lexbor assumes UTF-8 so callers decode with decode_html
+                return await response.read(), response.charset
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Error fetching {url}: {e}")
+        return None, None
+
+def decode_html(html, charset):
+    # Prefer the HTTP charset, then the page's own <meta> declaration, then UTF-8
+    encoding = charset or EncodingDetector.find_declared_encoding(html, is_html=True) or 'utf-8'
+    try:
+        return html.decode(encoding, 'replace')
+    except LookupError:  # Unknown charset name
+        return html.decode('utf-8', 'replace')
+
+def node_text(node):
+    # Same as BS4's get_text(' ', strip=True): strip every text node and join the non-empty
+    # ones with a space; lexbor's text(separator=' ') also keeps whitespace-only nodes
+    strings = (t.text(strip=True) for t in node.traverse(include_text=True)
+               if t.tag == '-text' and t.parent.tag not in ('script', 'style'))
+    return ' '.join(s for s in strings if s)
+
+async def getYearLinks(session, semaphore, yearlink):
+    html, _ = await fetch_page(session, semaphore, yearlink)
+    links = []
+    if html:
+        # Only the speech index list is needed, skip building the rest of the DOM
+        soup = BeautifulSoup(html, 'lxml', parse_only=SoupStrainer('ul', id='speechIndex'))
         speech_index = soup.find('ul', id='speechIndex')
-        links = []
         if speech_index:
-            parsed_base_url = urlparse(yearlink)
-            base_url = f'{parsed_base_url.scheme}://{parsed_base_url.netloc}'
             for a_tag in speech_index.find_all('a', href=True):
-                full_url = base_url + a_tag['href']
-                links.append(full_url)
-        return links
-    except requests.HTTPError as e:
-        print(f"Failed to fetch data from {yearlink}, status code: {e.response.status_code}")
-        return []
+                links.append(urljoin(yearlink, a_tag['href']))
+    return links
 
 def extract_date_from_url(url):
     parsed_url = urlparse(url)
@@ -115,53 +74,85 @@ def extract_date_from_url(url):
     date_segment = path_segments[-1].split('.')[0]
     return date_segment
 
-def scrape_speech_data(year):
-    complete_speech_data = []
+async def scrape_speech_data(session, semaphore, speech_url):
+    html, charset = await fetch_page(session, semaphore, speech_url)
+    if html:
+        date = extract_date_from_url(speech_url)
+        # Decode once with the page charset; the title and the lexbor tree both use the text
+        page_text = decode_html(html, charset)
+        # The title is only needed for the speaker name, so match it without parsing
+        title_match = _TITLE_RE.search(page_text)
+        title_text = unescape(title_match.group(1)) if title_match else ''
+        speaker_match = _SPEAKER_RE.search(title_text)
+        speaker_name = speaker_match.group(1) if speaker_match else 'Speaker name not found'
+        # Speech pages are the hot path, parse them with the C-backed lexbor parser
+        tree = LexborHTMLParser(page_text)
+        parts = []
+        # CSS selection yields each matching element once, in document order
+        for node in tree.css('table[width="600"] p, table[width="600"] li'):
+            text = node_text(node)  # Use space as a separator for <br/> tags
+            if node.tag == 'li':
+                parts.append('• ' + text + '\n')
+            else:
+                parts.append(text + '\n')
+        concatenated_text = ''.join(parts)
+        return {
+            'date': date,
+            'speaker': speaker_name,
+            'content': concatenated_text
+        }
+    return {}
+
+async def fetch_speeches_for_year(session, semaphore, year):
     dateurl = f'https://www.federalreserve.gov/newsevents/speech/{year}speech.htm'
-    yearlinks = getYearLinks(dateurl)
-    for monthslinks in yearlinks:
-        date = extract_date_from_url(monthslinks)
-        try:
-            response = requests.get(monthslinks)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser', from_encoding=response.encoding)
-            title_text = soup.find('title').text
-            speaker_match = re.search(r'Speech,\s(.*?)\s--', title_text)
-            speaker_name = speaker_match.group(1) if speaker_match else 'Speaker name not found'
-            concatenated_text = ''
-            tables = soup.find_all('table', width="600")
-            visited_elements = set()
-            for table in tables:
-                for child in table.descendants:
-                    if child.name in ['p', 'ul', 'li'] and child not in visited_elements:
-                        visited_elements.add(child)
-                        text = child.get_text(" ", strip=True)  # Use space as a separator for <br/> tags
-                        if child.name == 'li':
-                            concatenated_text += '• ' + text + '\n'
-                        else:
-                            concatenated_text += text + '\n'
-            speech_data = {
-                'date': date,
-                'speaker': speaker_name,
-                'content': concatenated_text
-            }
-            complete_speech_data.append(speech_data)
-        except requests.HTTPError as e:
-            print(f"Failed to fetch data from {monthslinks}, status code: {e.response.status_code}")
-
-    save_to_csv(complete_speech_data, year)
+    yearlinks = await getYearLinks(session, semaphore, dateurl)
+    speeches = await asyncio.gather(*[scrape_speech_data(session, semaphore, u) for u in yearlinks])
+    # Filter out pages that failed to download
+    return [speech for speech in speeches if speech]
 
 def save_to_csv(data, year):
     filename = f"speeches_{year}.csv"
-    keys = data[0].keys() if data else ["date", "speaker", "content"]
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=keys)
-        writer.writeheader()
-        for speech_data in data:
-            writer.writerow(speech_data)
+    # pyarrow's native CSV writer avoids per-row Python dispatch
+    table = pa.Table.from_pylist(data, schema=SPEECH_SCHEMA)
+    pacsv.write_csv(table, filename, write_options=pacsv.WriteOptions(batch_size=4096))
     print(f"Data for {year} saved to {filename}")
 
+async def scrape_year(session, semaphore, year):
+    speeches = await fetch_speeches_for_year(session, semaphore, year)
+    save_to_csv(speeches, year)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Scrape Federal Reserve speeches published up to 2010.')
+    parser.add_argument('--start-year', type=int, default=1996, help='first year to scrape (default: 1996)')
+    parser.add_argument('--end-year', type=int, default=2010, help='last year to scrape, inclusive (default: 2010)')
+    return parser.parse_args()
+
+async def main(args):
+    years = range(args.start_year, args.end_year + 1)
+    # Bound in-flight requests so the Fed webserver is not flooded
+    semaphore = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+    connector = aiohttp.TCPConnector(limit=64, limit_per_host=MAX_CONNECTIONS_PER_HOST, ttl_dns_cache=600,
+                                     keepalive_timeout=60, enable_cleanup_closed=True)
+    # sock_connect bounds the TCP/TLS connect only; 'connect' would also count time queued for a pooled connection
+    timeout = aiohttp.ClientTimeout(total=30, sock_connect=10)
+    # Published speeches never change, so they are cached forever;
+    # year index pages can gain new entries and are refreshed daily
+    cache = SQLiteBackend('fed_cache.sqlite', expire_after=-1,
+                          urls_expire_after={'www.federalreserve.gov/newsevents/speech/*speech.htm': timedelta(days=1)})
+    # Only transient failures (429/5xx, dropped connections, timeouts) are retried with exponential
+    # backoff; permanent errors such as InvalidURL or TooManyRedirects fail straight away
+    retry_options = ExponentialRetry(attempts=5, start_timeout=0.5, statuses={429, 500, 502, 503, 504},
+                                     exceptions={aiohttp.ClientConnectionError, aiohttp.ServerDisconnectedError,
+                                                 asyncio.TimeoutError})
+    cached_session = CachedSession(cache=cache, connector=connector, timeout=timeout)
+    async with RetryClient(client_session=cached_session, retry_options=retry_options) as session:
+        # Years are independent, scrape them all at once on the shared session
+        await asyncio.gather(*[scrape_year(session, semaphore, year) for year in years])
+
 if __name__ == "__main__":
-    pre2010dates = [str(date) for date in range(1996, 2011)]
-    for date in pre2010dates:
-        scrape_speech_data(date)
+    try:
+        import uvloop
+    except ImportError:  # uvloop is optional and does not support Windows
+        asyncio.run(main(parse_args()))
+    else:
+        uvloop.run(main(parse_args()))
@@ -1,33 +1,63 @@
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
+from aiohttp_client_cache import CachedSession, SQLiteBackend
+from aiohttp_retry import ExponentialRetry, RetryClient
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.dammit import EncodingDetector
+from selectolax.lexbor import LexborHTMLParser
 from urllib.parse import urljoin
 from urllib.parse import urlparse
-import pandas as pd
+from datetime import timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-async def fetch_page(session, url):
+SPEECH_SCHEMA = pa.schema([('date', pa.string()), ('speaker', pa.string()), ('content', pa.string())])
+BATCH_SIZE = 1000
+# Every request goes to one host: the semaphore and the connector share this cap so no
+# admitted request ever queues for a pooled connection
+MAX_CONNECTIONS_PER_HOST = 16
+HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'),
+    # aiohttp transparently decodes gzip, and br when the brotli package is installed
+    'Accept-Encoding': 'gzip, br',
+}
+
+async def fetch_page(session, semaphore, url):
+    # The session retries transient errors, only give up once its attempts are exhausted
     try:
-        async with session.get(url) as response:
-            if response.status:
-                return await response.text()
-    except Exception as e:
+        async with semaphore:
+            async with session.get(url, headers=HEADERS) as response:
+                response.raise_for_status()  # Raises an exception for 4XX/5XX errors
+                # Return raw bytes plus the HTTP charset (None if the header has none); lxml reads
+                # <meta> from bytes itself, lexbor assumes UTF-8 so callers decode with decode_html
+                return await response.read(), response.charset
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print(f"Error fetching {url}: {e}")
-    return None
+        return None, None
+
+def decode_html(html, charset):
+    # Prefer the HTTP charset, then the page's own <meta> declaration, then UTF-8
+    encoding = charset or EncodingDetector.find_declared_encoding(html, is_html=True) or 'utf-8'
+    try:
+        return html.decode(encoding, 'replace')
+    except LookupError:  # Unknown charset name
+        return html.decode('utf-8', 'replace')
 
-async def fetch_and_parse_speech(session, url):
-    html = await fetch_page(session, url)
+async def fetch_and_parse_speech(session, semaphore, url):
+    html, charset = await fetch_page(session, semaphore, url)
     if html:
-        soup = BeautifulSoup(html, 'html.parser')
-        article_div = soup.find('div', id='article')
-        if not article_div:
+        # Speech pages are the hot path, parse them with the C-backed lexbor parser
+        tree = LexborHTMLParser(decode_html(html, charset))
+        if tree.css_first('div#article') is None:
             print('Error: no article div found')
             return
 
-        speaker_tag = article_div.find('p', class_='speaker')
-        speaker = speaker_tag.text if speaker_tag else 'Speaker not found'
+        speaker_tag = tree.css_first('div#article p.speaker')
+        speaker = speaker_tag.text() if speaker_tag else 'Speaker not found'
 
-        content_paragraphs = article_div.find_all('p', class_=False, id=False)
-        content = ' '.join(paragraph.text for paragraph in content_paragraphs)
+        content_paragraphs = tree.css('div#article p:not([class]):not([id])')
+        content = ' '.join(paragraph.text() for paragraph in content_paragraphs)
 
         parsed_url = urlparse(url)
         path_segments = parsed_url.path.split('/')
@@ -41,11 +71,11 @@ async def fetch_and_parse_speech(session, url):
         }
         return speech_data
 
-async def fetch_speeches_for_year(session, year):
+async def fetch_speeches_for_year(session, semaphore, year):
     date_url = f'https://www.federalreserve.gov/newsevents/speech/{year}-speeches.htm'
-    html = await fetch_page(session, date_url)
+    html, _ = await fetch_page(session, semaphore, date_url)
     if html:
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, 'lxml', parse_only=SoupStrainer('div', class_='row eventlist'))
         eventList = soup.find('div', class_='row eventlist')
 
         hrefs = []
@@ -56,20 +86,58 @@ async def fetch_speeches_for_year(session, year):
                     full_url = urljoin(date_url, a_tag['href'])
                     hrefs.append(full_url)
 
-        tasks = [fetch_and_parse_speech(session, url) for url in hrefs]
-        await asyncio.gather(*tasks)
+        # Yield speeches as soon as they are parsed so they can be streamed to disk
+        tasks = [fetch_and_parse_speech(session, semaphore, url) for url in hrefs]
+        for next_speech in asyncio.as_completed(tasks):
+            speech = await next_speech
+            if speech:
+                yield speech
+
+def write_batch(writer, batch):
+    # Speeches arrive in download-completion order, sort by date so output is stable across runs
+    batch.sort(key=lambda speech: speech['date'])
+    writer.write_table(pa.Table.from_pylist(batch, schema=SPEECH_SCHEMA))
+
+async def process_year(session, semaphore, year):
+    # Each year streams into its own writer, so concurrent years never share a file
+    parquet_filename = f'speeches_{year}.parquet'
+    with pq.ParquetWriter(parquet_filename, SPEECH_SCHEMA, compression='zstd') as writer:
+        batch = []
+        async for speech in fetch_speeches_for_year(session, semaphore, year):
+            batch.append(speech)
+            if len(batch) >= BATCH_SIZE:
+                write_batch(writer, batch)
+                batch = []
+        if batch:
+            write_batch(writer, batch)
+    print(f"Data for {year} saved to {parquet_filename}")
 
 async def main():
     years = range(2011, 2024)
-    async with aiohttp.ClientSession() as session:
-        for year in years:
-            speeches = await fetch_speeches_for_year(session, year)
-            # Filter out empty results
-            speeches = [speech for speech in speeches if speech]
-            df = pd.DataFrame(speeches)
-            csv_filename = f'speeches_{year}.csv'
-            df.to_csv(csv_filename, index=False)
-            print(f"Data for {year} saved to {csv_filename}")
+    # One pooled keep-alive session for every year, bounded in-flight requests
+    semaphore = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+    connector = aiohttp.TCPConnector(limit=64, limit_per_host=MAX_CONNECTIONS_PER_HOST, ttl_dns_cache=600,
+                                     keepalive_timeout=60, enable_cleanup_closed=True)
+    # sock_connect bounds the TCP/TLS connect only; 'connect' would also count time queued for a pooled connection
+    timeout = aiohttp.ClientTimeout(total=30, sock_connect=10)
+    # Published speeches never change, so they are cached forever;
+    # year index pages can gain new entries and are refreshed daily
+    cache = SQLiteBackend('fed_cache.sqlite', expire_after=-1,
+                          urls_expire_after={'www.federalreserve.gov/newsevents/speech/*-speeches.htm': timedelta(days=1)})
+    # Only transient failures (429/5xx, dropped connections, timeouts) are retried with exponential
+    # backoff; permanent errors such as InvalidURL or TooManyRedirects fail straight away
+    retry_options = ExponentialRetry(attempts=5, start_timeout=0.5, statuses={429, 500, 502, 503, 504},
+                                     exceptions={aiohttp.ClientConnectionError, aiohttp.ServerDisconnectedError,
+                                                 asyncio.TimeoutError})
+    cached_session = CachedSession(cache=cache, connector=connector, timeout=timeout)
+    async with RetryClient(client_session=cached_session, retry_options=retry_options) as session:
+        # Years are independent, scrape them all at once on the shared session
+        await asyncio.gather(*[process_year(session, semaphore, year) for year in years])
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:  # uvloop is optional and does not support Windows
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
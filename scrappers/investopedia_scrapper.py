@@ -3,20 +3,20 @@ Investopedia Scraper
 ====================
 
 This script scrapes financial terms and their summaries from Investopedia.
-The script uses asynchronous programming for network requests and concurrent
-programming to process data efficiently. It saves the scraped data into CSV
-files.
+The script uses asynchronous programming for network requests, sharing a
+single HTTP session across all pages. It saves the scraped data into
+Parquet files.
 
 Modules
 -------
 - asyncio: Supports asynchronous programming.
 - aiohttp: Handles asynchronous HTTP requests.
+- aiohttp_client_cache: Caches HTTP responses on disk between runs.
+- aiohttp_retry: Retries transient HTTP failures with exponential backoff.
 - BeautifulSoup: Parses HTML content.
 - pandas: Manages and manipulates data.
+- pyarrow: Writes the Parquet output files.
 - re: Provides regular expression matching operations.
-- concurrent.futures: Provides a high-level interface for asynchronously
-    executing callables.
-- threading: Constructs higher-level threading interfaces.
 - tqdm: Displays progress bars.
 - os: Provides a way of using operating system-dependent functionality.
 
@@ -27,46 +27,64 @@ Run the script using the command:
     python investopedia_scraper.py
 
 Ensure you have the required modules installed:
-    pip install aiohttp beautifulsoup4 pandas tqdm
+    pip install aiohttp aiohttp-client-cache aiohttp-retry aiosqlite brotli \
+        beautifulsoup4 lxml pandas pyarrow tqdm
+
+On Linux and macOS, installing uvloop makes the script run on the faster
+libuv event loop:
+    pip install uvloop
 """
 
 import asyncio
 import aiohttp
-from aiohttp.client import ClientSession
-from bs4 import BeautifulSoup, Tag
+from aiohttp_client_cache import CachedSession, SQLiteBackend
+from aiohttp_retry import ExponentialRetry, RetryClient
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 import pandas as pd
 import re
 from typing import List, Optional, Tuple, Dict
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from threading import Thread
 from tqdm import tqdm
 import os
+from datetime import timedelta
+
+_URL_TERM_RE = re.compile(r"with(.+?)(\d+)$")
+# Every request goes to one host: the semaphore and the connector share
+# this cap so no admitted request ever queues for a pooled connection
+MAX_CONNECTIONS_PER_HOST = 16
 
 
 async def fetch_page(
-    session: ClientSession, url: str, headers: Dict[str, str]
-) -> Optional[str]:
+    session: RetryClient, url: str, headers: Dict[str, str],
+    semaphore: asyncio.Semaphore
+) -> Optional[bytes]:
     """
     Fetches the HTML content of the given URL asynchronously.
 
     Parameters
     ----------
-    session : aiohttp.ClientSession
-        The aiohttp session for making the HTTP request.
+    session : aiohttp_retry.RetryClient
+        The retrying aiohttp session for making the HTTP request.
     url : str
         The URL to fetch the HTML content from.
     headers : dict
         The headers to include in the HTTP request.
+    semaphore : asyncio.Semaphore
+        The semaphore bounding the number of in-flight requests.
 
     Returns
     -------
-    str or None
-        The HTML content of the page, or None if an error occurs.
+    bytes or None
+        The raw HTML content of the page, or None if the request still
+        fails once the session has exhausted its retries. The bytes are
+        handed to the parser undecoded, which reads the charset from the
+        document itself.
     """
     try:
-        async with session.get(url, headers=headers) as response:
-            return await response.text()
-    except Exception as e:
+        async with semaphore:
+            async with session.get(url, headers=headers) as response:
+                response.raise_for_status()
+                return await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print(f"Error fetching {url}: {e}")
         return None
 
@@ -85,8 +103,7 @@ def extract_text(url: str) -> str:
     str
         The extracted text or 'No match found' if no match is found.
     """
-    pattern = r"with(.+?)(\d+)$"
-    match = re.search(pattern, url)
+    match = _URL_TERM_RE.search(url)
     if match:
         return match.group(1).strip('-')
     else:
@@ -94,7 +111,8 @@ def extract_text(url: str) -> str:
 
 
 async def fetch_main_links(
-    session: ClientSession, url: str, headers: Dict[str, str]
+    session: RetryClient, url: str, headers: Dict[str, str],
+    semaphore: asyncio.Semaphore
 ) -> List[str]:
     """
     Fetches the main links from the Investopedia financial
@@ -102,21 +120,26 @@ async def fetch_main_links(
 
     Parameters
     ----------
-    session : aiohttp.ClientSession
-        The aiohttp session for making the HTTP request.
+    session : aiohttp_retry.RetryClient
+        The retrying aiohttp session for making the HTTP request.
     url : str
         The URL to fetch the main links from.
     headers : dict
         The headers to include in the HTTP request.
+    semaphore : asyncio.Semaphore
+        The semaphore bounding the number of in-flight requests.
 
     Returns
     -------
     list
         A list of main link URLs.
     """
-    html = await fetch_page(session, url, headers)
+    html = await fetch_page(session, url, headers, semaphore)
     if html:
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(
+            html, 'lxml',
+            parse_only=SoupStrainer('ul', id='terms-bar__list_1-0')
+        )
         terms_list = soup.find('ul', id='terms-bar__list_1-0')
         if isinstance(terms_list, Tag):
             return [
@@ -127,28 +150,36 @@ async def fetch_main_links(
 
 
 async def fetch_detail_links(
-    session: ClientSession, url: str, headers: Dict[str, str]
+    session: RetryClient, url: str, headers: Dict[str, str],
+    semaphore: asyncio.Semaphore
 ) -> List[str]:
     """
     Fetches the detailed links from each main link page.
 
     Parameters
     ----------
-    session : aiohttp.ClientSession
-        The aiohttp session for making the HTTP request.
+    session : aiohttp_retry.RetryClient
+        The retrying aiohttp session for making the HTTP request.
     url : str
         The main link URL to fetch the detail links from.
     headers : dict
         The headers to include in the HTTP request.
+    semaphore : asyncio.Semaphore
+        The semaphore bounding the number of in-flight requests.
 
     Returns
     -------
     list
         A list of detail link URLs.
     """
-    html = await fetch_page(session, url, headers)
+    html = await fetch_page(session, url, headers, semaphore)
     if html:
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(
+            html, 'lxml',
+            parse_only=SoupStrainer(
+                'div', id='dictionary-top300-list__content_1-0'
+            )
+        )
         content = soup.find('div', id='dictionary-top300-list__content_1-0')
         if isinstance(content, Tag):
             return [
@@ -159,30 +190,40 @@ async def fetch_detail_links(
 
 
 async def scrape_title_and_summary(
-    session: ClientSession, url: str, headers: Dict[str, str]
+    session: RetryClient, url: str, headers: Dict[str, str],
+    semaphore: asyncio.Semaphore
 ) -> Tuple[str, str]:
     """
     Scrapes the title and summary from the detail link page.
 
     Parameters
     ----------
-    session : aiohttp.ClientSession
-        The aiohttp session for making the HTTP request.
+    session : aiohttp_retry.RetryClient
+        The retrying aiohttp session for making the HTTP request.
     url : str
         The detail link URL to scrape the title and summary from.
     headers : dict
         The headers to include in the HTTP request.
+    semaphore : asyncio.Semaphore
+        The semaphore bounding the number of in-flight requests.
 
     Returns
     -------
     tuple
         A tuple containing the title and summary of the page.
     """
-    html = await fetch_page(session, url, headers)
+    html = await fetch_page(session, url, headers, semaphore)
     if html:
-        soup = BeautifulSoup(html, 'html.parser')
-        title_tag = soup.find('title')
+        # The title lives in <head>, so it gets its own strained parse
+        title_soup = BeautifulSoup(
+            html, 'lxml', parse_only=SoupStrainer('title')
+        )
+        title_tag = title_soup.find('title')
         title = title_tag.text.strip() if title_tag else 'No Title Found'
+        soup = BeautifulSoup(
+            html, 'lxml',
+            parse_only=SoupStrainer('div', id='mntl-sc-block-callout-body_1-0')
+        )
         div = soup.find('div', id='mntl-sc-block-callout-body_1-0')
         if isinstance(div, Tag):
             summary = (
@@ -193,126 +234,71 @@ async def scrape_title_and_summary(
     return 'No Title Found', 'No Summary Found'
 
 
-def process_chunk(
-    detail_links_chunk: List[str], headers: Dict[str, str]
-) -> List[Tuple[str, str]]:
-    """
-    Processes a chunk of detail links concurrently.
-
-    Parameters
-    ----------
-    detail_links_chunk : list
-        The list of detail link URLs to process.
-    headers : dict
-        The headers to include in the HTTP request.
-
-    Returns
-    -------
-    list
-        A list of tuples containing the title and summary for each detail link.
-    """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
-    async def get_data() -> List[Tuple[str, str]]:
-        async with aiohttp.ClientSession() as session:
-            tasks = [
-                scrape_title_and_summary(session, url, headers)
-                for url in detail_links_chunk
-            ]
-            return await asyncio.gather(*tasks)
-
-    results: List[Tuple[str, str]] = loop.run_until_complete(get_data())
-    loop.close()
-    return results
-
-
-async def handle_main_link(
-    session: ClientSession, link: str, headers: Dict[str, str],
-    progress_bar: Optional[tqdm] = None
-) -> None:
+async def scrape_detail_link(
+    session: RetryClient, link: str, url: str, headers: Dict[str, str],
+    semaphore: asyncio.Semaphore, progress_bar: Optional[tqdm] = None
+) -> Tuple[str, Tuple[str, str]]:
     """
-    Handles fetching and processing of detail links for a given main link.
+    Scrapes a detail link and tags the result with its main link.
 
     Parameters
     ----------
-    session : aiohttp.ClientSession
-        The aiohttp session for making the HTTP request.
+    session : aiohttp_retry.RetryClient
+        The retrying aiohttp session for making the HTTP request.
     link : str
-        The main link URL to handle.
+        The main link URL the detail link was listed on.
+    url : str
+        The detail link URL to scrape.
     headers : dict
         The headers to include in the HTTP request.
+    semaphore : asyncio.Semaphore
+        The semaphore bounding the number of in-flight requests.
     progress_bar : tqdm.tqdm, optional
         The progress bar to update during processing (default is None).
 
     Returns
     -------
-    None
+    tuple
+        The main link URL and the (title, summary) tuple of the page.
     """
-    detail_links = await fetch_detail_links(session, link, headers)
-    data: List[Tuple[str, str]] = []
-
-    chunk_size = 50
-    chunks = [
-        detail_links[i:i + chunk_size]
-        for i in range(0, len(detail_links), chunk_size)
-    ]
-
-    with ProcessPoolExecutor() as executor:
-        futures = [
-            executor.submit(process_chunk, chunk, headers)
-            for chunk in chunks
-        ]
-        for future in as_completed(futures):
-            data.extend(future.result())
+    result = await scrape_title_and_summary(session, url, headers, semaphore)
+    if progress_bar is not None:
+        progress_bar.update(1)
+    return link, result
 
-    if data:
-        df = pd.DataFrame(data, columns=['Title', 'Summary'])
-        csv_filename = 'data/investopedia/' + extract_text(link) + '.csv'
-        df.to_csv(csv_filename, index=False)
-        print(f"Data saved to {csv_filename}")
 
-
-def handle_main_link_threaded(
-    links_chunk: List[str], headers: Dict[str, str], progress_bar: tqdm
-) -> None:
+def save_main_link_data(link: str, data: List[Tuple[str, str]]) -> None:
     """
-    Manages threading for handling main link chunks.
+    Saves the scraped terms of a main link to a Parquet file.
 
     Parameters
     ----------
-    links_chunk : list
-        The list of main link URLs to handle.
-    headers : dict
-        The headers to include in the HTTP request.
-    progress_bar : tqdm.tqdm
-        The progress bar to update during processing.
+    link : str
+        The main link URL the terms were listed on.
+    data : list
+        A list of (title, summary) tuples for the main link.
 
     Returns
     -------
     None
     """
-    async def inner(session: ClientSession) -> None:
-        tasks = [
-            handle_main_link(session, link, headers, progress_bar)
-            for link in links_chunk
-        ]
-        await asyncio.gather(*tasks)
-
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    session = aiohttp.ClientSession(loop=loop)
-    loop.run_until_complete(inner(session))
-    loop.run_until_complete(session.close())
-    loop.close()
+    if data:
+        df = pd.DataFrame(data, columns=['Title', 'Summary'])
+        parquet_filename = (
+            'data/investopedia/' + extract_text(link) + '.parquet'
+        )
+        df.to_parquet(parquet_filename, compression='zstd', index=False)
+        print(f"Data saved to {parquet_filename}")
 
 
 async def main() -> None:
     """
     The main function to orchestrate the entire scraping process.
 
-    Creates necessary directories, initializes headers and session,
-    and starts the scraping process using multiple threads.
+    Creates necessary directories, initializes headers and a single
+    cached session, collects the detail links of every main link and
+    scrapes them all in one batch on that session, then saves one file
+    per main link.
 
     Returns
     -------
@@ -328,39 +314,81 @@ async def main() -> None:
         'User-Agent': (
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
             '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-        )
+        ),
+        # aiohttp transparently decodes gzip, and br when brotli is installed
+        'Accept-Encoding': 'gzip, br',
     }
     main_url = "https://www.investopedia.com/financial-term-dictionary-4769738"
-
-    async with aiohttp.ClientSession() as session:
-        main_links = await fetch_main_links(session, main_url, headers)
-
-        num_threads = 6
-        links_per_thread = len(main_links) // num_threads + (
-            1 if len(main_links) % num_threads else 0
+    semaphore = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+    connector = aiohttp.TCPConnector(
+        limit=64, limit_per_host=MAX_CONNECTIONS_PER_HOST, ttl_dns_cache=600,
+        keepalive_timeout=60, enable_cleanup_closed=True
+    )
+    # sock_connect bounds the TCP/TLS connect only; 'connect' would also
+    # count time spent queued for a pooled connection
+    timeout = aiohttp.ClientTimeout(total=30, sock_connect=10)
+
+    # Term pages are revised now and then, so cached copies expire weekly
+    cache = SQLiteBackend(
+        'investopedia_cache.sqlite', expire_after=timedelta(days=7)
+    )
+
+    # Only transient failures (429/5xx, dropped connections, timeouts) are
+    # retried with exponential backoff; permanent errors such as InvalidURL
+    # or TooManyRedirects fail straight away
+    retry_options = ExponentialRetry(
+        attempts=5, start_timeout=0.5,
+        statuses={429, 500, 502, 503, 504},
+        exceptions={
+            aiohttp.ClientConnectionError, aiohttp.ServerDisconnectedError,
+            asyncio.TimeoutError
+        }
+    )
+    cached_session = CachedSession(
+        cache=cache, connector=connector, timeout=timeout
+    )
+
+    async with RetryClient(
+        client_session=cached_session, retry_options=retry_options
+    ) as session:
+        main_links = await fetch_main_links(
+            session, main_url, headers, semaphore
         )
 
-        threads: List[Thread] = []
-        progress_bars = [
-            tqdm(total=links_per_thread, position=i, desc=f'Thread {i+1}')
-            for i in range(num_threads)
+        detail_links_per_main = await asyncio.gather(*(
+            fetch_detail_links(session, link, headers, semaphore)
+            for link in main_links
+        ))
+        # Batch every detail link across main links so the connection
+        # pool stays warm, carrying the main link to group results back
+        tagged_links = [
+            (link, url)
+            for link, detail_links in zip(main_links, detail_links_per_main)
+            for url in detail_links
         ]
 
-        for i in range(0, len(main_links), links_per_thread):
-            chunk = main_links[i:i + links_per_thread]
-            thread = Thread(
-                target=handle_main_link_threaded,
-                args=(chunk, headers, progress_bars[i // links_per_thread])
-            )
-            threads.append(thread)
-            thread.start()
+        with tqdm(total=len(tagged_links), desc='Terms') as progress_bar:
+            results = await asyncio.gather(*(
+                scrape_detail_link(
+                    session, link, url, headers, semaphore, progress_bar
+                )
+                for link, url in tagged_links
+            ))
 
-        for thread in threads:
-            thread.join()
+    grouped: Dict[str, List[Tuple[str, str]]] = {
+        link: [] for link in main_links
+    }
+    for link, result in results:
+        grouped[link].append(result)
 
-        for pb in progress_bars:
-            pb.close()
+    for link, data in grouped.items():
+        save_main_link_data(link, data)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:  # uvloop is optional and does not support Windows
+        asyncio.run(main())
+    else:
+        uvloop.run(main())